@@ -17,7 +17,8 @@ vertexai.init(
 
 from google.generativeai import types as genai_types  # Para tipos específicos do Google Generative AI, como SafetySetting
 from google.adk.agents import Agent # Para criar o agente
-from .tools.tools import get_pokemon_types, get_time, get_weekday, get_pokemon_abilities, get_pokemon_evolution, get_pokemon_pokedex_entry, get_pokemon_stats, procurar_treinador_por_nome, get_pokemon_sprite_url, adicionar_treinador, adicionar_pokemons, apagar_treinador, listar_pokemons, apagar_pokemon, listar_treinadores, evoluir_pokemon
+from .tools.tools import get_pokemon_types, get_time, get_weekday, get_pokemon_abilities, get_pokemon_evolution, get_pokemon_pokedex_entry, get_pokemon_stats, procurar_treinador_por_nome, get_pokemon_sprite_url, adicionar_treinador, adicionar_pokemons, apagar_treinador, listar_pokemons, apagar_pokemon, listar_treinadores, evoluir_pokemon, metricas_fila_escrita, reprocessar_fila_escrita
+from .tools.analise_equipe import analisar_equipe
 from vertexai import agent_engines
 
 
@@ -90,6 +91,7 @@ Para consultas sobre Pokémon (usando a PokeAPI):
 - Para adicionar Pokémon à equipe de um treinador existente: "Adicionar Squirtle para o treinador com ID 1." (Lembre-se que cada treinador pode ter no máximo 6 Pokémon na equipe).
 - Para remover um Pokémon da equipe de um treinador: "Remover Pikachu do treinador ID 1." (Informe o ID do treinador e o nome do Pokémon a ser removido).
 - Para evoluir um Pokémon da equipe de um treinador: "Evoluir Pikachu do treinador ID 1." (Informe o ID do treinador e o nome do Pokémon a ser evoluido), quando o treinador não especificar a evolução já de o nome da próxima evolução do pokémon para ele como opção, se tiver mais de uma liste.
+- Para analisar a equipe de um treinador: "Quais as fraquezas da equipe do treinador ID 1?" (Mostro as fraquezas e resistências de cada Pokémon, a cobertura de tipos da equipe e sugiro Pokémon para completá-la).
 - Para apagar um treinador do sistema: "Apagar treinador com ID 2." (Atenção: isso também removerá todos os Pokémon da equipe dele).
 
 Outras Utilidades:
@@ -117,7 +119,10 @@ Para todas as outras perguntas ou solicitações, responda diretamente e da form
         apagar_pokemon,
         listar_treinadores,
         evoluir_pokemon,
-        procurar_treinador_por_nome
+        procurar_treinador_por_nome,
+        analisar_equipe,
+        metricas_fila_escrita,
+        reprocessar_fila_escrita
            ],  # Lista de ferramentas (funções) que o agente pode usar.
     generate_content_config=generate_content_config,  # Aplica as configurações de geração definidas anteriormente.
 )
@@ -0,0 +1,521 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import BadRequest
+from google.cloud.bigquery import ArrayQueryParameter, QueryJobConfig, ScalarQueryParameter, StructQueryParameter
+
+from .connection import get_bq_client
+
+# Modo write-behind: as mutações da equipe vão para uma fila local (SQLite) e são
+# aplicadas no BigQuery em um único MERGE a cada intervalo.
+WRITE_BEHIND_ATIVO = os.getenv("EQUIPE_WRITE_BEHIND", "").strip().lower() in ("1", "true", "sim")
+# Fica no diretório da aplicação e não no diretório temporário do sistema, que costuma
+# ser limpo em reinícios e levaria junto mutações já confirmadas ao usuário.
+FILA_PATH = os.getenv("EQUIPE_FILA_PATH") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fila_equipe.sqlite3")
+FLUSH_INTERVALO = float(os.getenv("EQUIPE_FLUSH_INTERVALO", "5"))
+# Após esse número de falhas seguidas, o lote é reaplicado por treinador. Só vão para a
+# tabela `mutacoes_mortas` os grupos rejeitados pelo BigQuery (400) ou que falham enquanto
+# outros passam; se todos falham, é tratado como indisponibilidade e a fila fica intacta.
+FLUSH_MAX_TENTATIVAS = int(os.getenv("EQUIPE_FLUSH_MAX_TENTATIVAS", "5"))
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def get_fila_escrita(table_equipe: str):
+    """
+    Retorna a fila write-behind da tabela de equipes, ou None se o modo estiver desativado.
+    """
+    global _fila
+    if not WRITE_BEHIND_ATIVO:
+        return None
+    with _fila_lock:
+        if _fila is None:
+            print(f"INFO: Modo write-behind ativo. Fila local em '{FILA_PATH}', flush a cada {FLUSH_INTERVALO}s.")
+            _fila = FilaEscritaEquipe(FILA_PATH, table_equipe, FLUSH_INTERVALO, FLUSH_MAX_TENTATIVAS)
+            _fila.iniciar()
+        return _fila
+
+
+def aplicar_sobreposicao(equipe: list[dict], operacoes: list[dict]) -> list[dict]:
+    """Reaplica, em ordem, as mutações pendentes sobre as linhas lidas do BigQuery."""
+    equipe = [dict(p) for p in equipe]
+    for op in operacoes:
+        if op["operacao"] == "INSERT":
+            equipe.append({
+                "id_pokemon": op["id_pokemon"],
+                "nome_pokemon": op["nome_novo"],
+                "tipo_primario": op["tipo_primario"],
+                "tipo_secundario": op["tipo_secundario"],
+            })
+            continue
+        for p in equipe:
+            if p.get("nome_pokemon") and p["nome_pokemon"].lower() == op["nome_alvo"]:
+                if op["operacao"] == "DELETE":
+                    p["_apagado"] = True
+                else:
+                    p.update(nome_pokemon=op["nome_novo"], tipo_primario=op["tipo_primario"], tipo_secundario=op["tipo_secundario"])
+        equipe = [p for p in equipe if not p.pop("_apagado", False)]
+    return equipe
+
+
+def planejar_mutacoes(linhas_banco: list[dict], operacoes: list[dict]) -> list[dict]:
+    """
+    Converte as mutações por nome em mutações por `id_pokemon`, já com o estado final de cada linha.
+
+    `linhas_banco` são as linhas atuais dos treinadores do lote no BigQuery. As mutações são
+    reaplicadas sobre elas com a mesma regra da sobreposição de leitura, e o plano resultante
+    só casa por id: reaplicá-lo depois de um MERGE que já foi gravado não altera nada.
+    """
+    campos = ("nome_pokemon", "tipo_primario", "tipo_secundario")
+    criados_em = {op["id_pokemon"]: op["criado_em"] for op in operacoes if op["operacao"] == "INSERT"}
+    plano = []
+    for id_treinador in dict.fromkeys(op["id_treinador"] for op in operacoes):
+        originais = {l["id_pokemon"]: l for l in linhas_banco if l["id_treinador_fk"] == id_treinador}
+        final = aplicar_sobreposicao(
+            list(originais.values()), [op for op in operacoes if op["id_treinador"] == id_treinador]
+        )
+        final = {p["id_pokemon"]: p for p in final}
+
+        for id_pokemon, linha in originais.items():
+            atual = final.get(id_pokemon)
+            if atual is not None and all(atual[c] == linha[c] for c in campos):
+                continue
+            operacao = "DELETE" if atual is None else "UPDATE"
+            plano.append(_linha_plano(operacao, id_treinador, id_pokemon, atual, None))
+        for id_pokemon, atual in final.items():
+            if id_pokemon not in originais:
+                plano.append(_linha_plano("INSERT", id_treinador, id_pokemon, atual, criados_em[id_pokemon]))
+    return plano
+
+
+def _linha_plano(operacao: str, id_treinador: str, id_pokemon: str, atual, criado_em) -> dict:
+    return {
+        "operacao": operacao,
+        "id_treinador": id_treinador,
+        "id_pokemon": id_pokemon,
+        "nome_novo": atual["nome_pokemon"] if atual else None,
+        "tipo_primario": atual["tipo_primario"] if atual else None,
+        "tipo_secundario": atual["tipo_secundario"] if atual else None,
+        "criado_em": criado_em,
+    }
+
+
+class FilaEscritaEquipe:
+    """
+    Fila durável de mutações da tabela EquipePokemons com flush periódico via MERGE.
+
+    Cada mutação é confirmada assim que gravada no SQLite local. Uma thread em segundo
+    plano coalesce tudo o que estiver pendente e aplica em um único job de DML, evitando
+    a fila de DMLs concorrentes que o BigQuery impõe por tabela.
+    """
+
+    def __init__(self, caminho: str, table_equipe: str, intervalo: float, max_tentativas: int):
+        self.caminho = caminho
+        self.table_equipe = table_equipe
+        self.intervalo = intervalo
+        self.max_tentativas = max_tentativas
+        self._falhas_consecutivas = 0
+        # Nenhum lock é mantido durante chamadas ao BigQuery. Uma leitura só é refeita se um
+        # flush do mesmo treinador começou ou terminou enquanto ela acontecia: nesse caso não
+        # dá para saber se o BigQuery já refletia o lote, e a sobreposição poderia aplicá-lo duas vezes.
+        self._estado = threading.Condition()
+        self._em_voo = set()  # Treinadores do lote cujo MERGE está em andamento.
+        self._geracoes = {}  # id_treinador -> número de flushes que já alteraram sua fila.
+        self._flush_lock = threading.Lock()  # Apenas um flush por vez.
+        self._parar = threading.Event()
+        self._thread = None
+        self._metricas = {
+            "flushes_ok": 0,
+            "flushes_falhos": 0,
+            "mutacoes_aplicadas": 0,
+            "ultima_latencia_ms": None,
+            "maior_latencia_ms": None,
+            "latencia_total_ms": 0.0,
+            "ultimo_atraso_ms": None,
+            "ultimo_flush_em": None,
+            "ultimo_erro": None,
+        }
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mutacoes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_treinador TEXT NOT NULL,
+                    operacao TEXT NOT NULL,
+                    nome_alvo TEXT,
+                    id_pokemon TEXT,
+                    nome_novo TEXT,
+                    tipo_primario TEXT,
+                    tipo_secundario TEXT,
+                    criado_em TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mutacoes_mortas (
+                    seq INTEGER PRIMARY KEY,
+                    id_treinador TEXT NOT NULL,
+                    operacao TEXT NOT NULL,
+                    nome_alvo TEXT,
+                    id_pokemon TEXT,
+                    nome_novo TEXT,
+                    tipo_primario TEXT,
+                    tipo_secundario TEXT,
+                    criado_em TEXT NOT NULL,
+                    erro TEXT,
+                    movido_em TEXT NOT NULL
+                )
+            """)
+            # Plano por id de um lote, gravado antes do MERGE e apagado junto com o lote: se o
+            # processo cair ou o resultado do job se perder, o próximo flush reaplica o mesmo
+            # plano em vez de recalculá-lo sobre um estado em que o lote já foi gravado.
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS planos (
+                    id_treinador TEXT PRIMARY KEY,
+                    seqs TEXT NOT NULL,
+                    mutacoes TEXT NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        """Abre uma conexão com a fila, confirma a transação ao final e sempre fecha a conexão."""
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enfileirar(self, id_treinador: str, operacao: str, nome_alvo: str = None, nome_novo: str = None,
+                   tipo_primario: str = None, tipo_secundario: str = None):
+        """Grava uma mutação (INSERT, DELETE ou UPDATE) na fila local."""
+        id_pokemon = str(uuid.uuid4()) if operacao == "INSERT" else None
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT INTO mutacoes (id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_treinador, operacao, nome_alvo.lower() if nome_alvo else None, id_pokemon, nome_novo,
+                 tipo_primario, tipo_secundario, datetime.now(timezone.utc).isoformat()),
+            )
+
+    def pendentes(self, id_treinador: str = None) -> list[dict]:
+        """Lista as mutações ainda não aplicadas, na ordem em que foram feitas."""
+        with self._conectar() as conn:
+            if id_treinador is None:
+                rows = conn.execute("SELECT * FROM mutacoes ORDER BY seq").fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM mutacoes WHERE id_treinador = ? ORDER BY seq", (id_treinador,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _liberadas(self) -> list[dict]:
+        """
+        Lista as mutações que podem ir para o próximo MERGE.
+
+        Um treinador com mutações em `mutacoes_mortas` fica bloqueado: as mutações que ele
+        fizer depois partem de um estado que nunca chegou ao BigQuery, então ficam retidas
+        na fila até o reprocessamento das mortas.
+        """
+        with self._conectar() as conn:
+            rows = conn.execute(
+                "SELECT * FROM mutacoes WHERE id_treinador NOT IN (SELECT id_treinador FROM mutacoes_mortas) ORDER BY seq"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _pendentes_com_mortas(self, id_treinador: str) -> list[dict]:
+        """Mutações do treinador ainda não gravadas, incluindo as mortas, que o usuário já viu confirmadas."""
+        with self._conectar() as conn:
+            rows = conn.execute("""
+                SELECT seq, id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em
+                FROM mutacoes WHERE id_treinador = ?
+                UNION ALL
+                SELECT seq, id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em
+                FROM mutacoes_mortas WHERE id_treinador = ?
+                ORDER BY seq
+            """, (id_treinador, id_treinador)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _concluir_lote(self, operacoes: list[dict], erro: str = None):
+        """
+        Tira um lote da fila e avança a geração dos treinadores afetados. Chamar com `_estado` adquirido.
+
+        Com `erro`, o lote é movido para `mutacoes_mortas` na mesma transação.
+        """
+        with self._conectar() as conn:
+            if erro is not None:
+                movido_em = datetime.now(timezone.utc).isoformat()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO mutacoes_mortas (seq, id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em, erro, movido_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(op["seq"], op["id_treinador"], op["operacao"], op["nome_alvo"], op["id_pokemon"], op["nome_novo"],
+                      op["tipo_primario"], op["tipo_secundario"], op["criado_em"], erro, movido_em) for op in operacoes],
+                )
+            conn.executemany("DELETE FROM mutacoes WHERE seq = ?", [(op["seq"],) for op in operacoes])
+            conn.executemany("DELETE FROM planos WHERE id_treinador = ?", [(t,) for t in {op["id_treinador"] for op in operacoes}])
+        for id_treinador in {op["id_treinador"] for op in operacoes}:
+            self._geracoes[id_treinador] = self._geracoes.get(id_treinador, 0) + 1
+
+    def descartar(self, id_treinador: str):
+        """Remove as mutações pendentes de um treinador (usado quando o treinador é apagado)."""
+        with self._estado:
+            while id_treinador in self._em_voo:
+                self._estado.wait()
+            with self._conectar() as conn:
+                conn.execute("DELETE FROM mutacoes_mortas WHERE id_treinador = ?", (id_treinador,))
+            self._concluir_lote(self.pendentes(id_treinador))
+
+    def ler_equipe(self, id_treinador: str, ler_do_banco) -> tuple:
+        """Executa a leitura `(contexto, equipe)` no BigQuery e aplica na equipe as mutações pendentes do treinador."""
+        while True:
+            with self._estado:
+                while id_treinador in self._em_voo:
+                    self._estado.wait()
+                geracao = self._geracoes.get(id_treinador, 0)
+            contexto, equipe = ler_do_banco()
+            pendentes = self._pendentes_com_mortas(id_treinador)
+            with self._estado:
+                if id_treinador not in self._em_voo and self._geracoes.get(id_treinador, 0) == geracao:
+                    return contexto, aplicar_sobreposicao(equipe, pendentes)
+
+    def flush(self) -> int:
+        """
+        Aplica todas as mutações pendentes em um único MERGE. Retorna quantas foram aplicadas.
+
+        Se o lote falhar `max_tentativas` vezes seguidas, ele é reaplicado por treinador; veja
+        `_aplicar_por_treinador` para quais grupos vão para `mutacoes_mortas`.
+        """
+        with self._flush_lock:
+            with self._estado:
+                planos = self._planos_salvos()
+                operacoes = self._operacoes_dos_planos(planos) if planos else self._liberadas()
+                if not operacoes:
+                    return 0
+                self._em_voo = {op["id_treinador"] for op in operacoes}
+
+            inicio = time.monotonic()
+            erro_isolado = None
+            try:
+                try:
+                    if not planos:
+                        planos = self._planejar(operacoes)
+                except Exception as e:
+                    self._registrar_falha(e)
+                    raise
+                try:
+                    self._aplicar(planos, operacoes)
+                    aplicadas = operacoes
+                except Exception as e:
+                    self._registrar_falha(e)
+                    if self._falhas_consecutivas < self.max_tentativas:
+                        raise
+                    print(f"ERRO: Lote da fila de equipes falhou {self._falhas_consecutivas} vezes seguidas, reaplicando por treinador. Erro: {e}")
+                    aplicadas, erro_isolado = self._aplicar_por_treinador(planos, operacoes)
+            finally:
+                with self._estado:
+                    self._em_voo = set()
+                    self._estado.notify_all()
+            if not aplicadas:
+                return 0
+            self._falhas_consecutivas = 0
+
+            agora = datetime.now(timezone.utc)
+            latencia_ms = (time.monotonic() - inicio) * 1000
+            m = self._metricas
+            m["flushes_ok"] += 1
+            m["mutacoes_aplicadas"] += len(aplicadas)
+            m["ultima_latencia_ms"] = round(latencia_ms, 1)
+            m["maior_latencia_ms"] = round(max(latencia_ms, m["maior_latencia_ms"] or 0), 1)
+            m["latencia_total_ms"] += latencia_ms
+            m["ultimo_atraso_ms"] = round((agora - datetime.fromisoformat(aplicadas[0]["criado_em"])).total_seconds() * 1000, 1)
+            m["ultimo_flush_em"] = agora.isoformat()
+            m["ultimo_erro"] = erro_isolado
+            return len(aplicadas)
+
+    def _registrar_falha(self, erro: Exception):
+        self._falhas_consecutivas += 1
+        self._metricas["flushes_falhos"] += 1
+        self._metricas["ultimo_erro"] = str(erro)
+
+    def _planos_salvos(self) -> dict:
+        """Planos de um lote que ainda não foi concluído, por treinador."""
+        with self._conectar() as conn:
+            rows = conn.execute("SELECT * FROM planos").fetchall()
+        return {row["id_treinador"]: {"seqs": json.loads(row["seqs"]), "mutacoes": json.loads(row["mutacoes"])} for row in rows}
+
+    def _operacoes_dos_planos(self, planos: dict) -> list[dict]:
+        seqs = [seq for plano in planos.values() for seq in plano["seqs"]]
+        with self._conectar() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM mutacoes WHERE seq IN ({', '.join('?' * len(seqs))}) ORDER BY seq", seqs
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _planejar(self, operacoes: list[dict]) -> dict:
+        """Lê as linhas atuais dos treinadores do lote, monta o plano por id e o grava antes do MERGE."""
+        treinadores = sorted({op["id_treinador"] for op in operacoes})
+        job_config = QueryJobConfig(query_parameters=[ArrayQueryParameter("treinadores", "STRING", treinadores)])
+        query_job = get_bq_client().query(f"""
+            SELECT id_pokemon, id_treinador_fk, nome_pokemon, tipo_primario, tipo_secundario
+            FROM {self.table_equipe}
+            WHERE id_treinador_fk IN UNNEST(@treinadores)
+            ORDER BY data_adicao
+        """, job_config=job_config)
+        mutacoes = planejar_mutacoes([dict(row.items()) for row in query_job.result()], operacoes)
+
+        planos = {
+            id_treinador: {
+                "seqs": [op["seq"] for op in operacoes if op["id_treinador"] == id_treinador],
+                "mutacoes": [m for m in mutacoes if m["id_treinador"] == id_treinador],
+            }
+            for id_treinador in treinadores
+        }
+        with self._conectar() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO planos (id_treinador, seqs, mutacoes) VALUES (?, ?, ?)",
+                [(t, json.dumps(p["seqs"]), json.dumps(p["mutacoes"])) for t, p in planos.items()],
+            )
+        return planos
+
+    def _aplicar(self, planos: dict, operacoes: list[dict]):
+        """Executa o MERGE do plano de um lote e, se der certo, o retira da fila."""
+        mutacoes = [m for id_treinador in {op["id_treinador"] for op in operacoes} for m in planos[id_treinador]["mutacoes"]]
+        if mutacoes:
+            self._executar_merge(mutacoes)
+        with self._estado:
+            self._concluir_lote(operacoes)
+
+    def _aplicar_por_treinador(self, planos: dict, operacoes: list[dict]) -> tuple:
+        """
+        Aplica o lote um treinador por vez e separa os grupos com dados problemáticos.
+
+        Um grupo vai para `mutacoes_mortas` se o BigQuery rejeitar os dados (BadRequest) ou se
+        ele falhar enquanto outros grupos do mesmo lote passam. Se nenhum grupo passar e as
+        falhas forem de outro tipo (indisponibilidade, autenticação, cota), nada é descartado e
+        o último erro é relançado para o flush seguir com o backoff.
+        """
+        grupos = {}
+        for op in operacoes:
+            grupos.setdefault(op["id_treinador"], []).append(op)
+
+        aplicadas, falhas = [], []
+        for id_treinador, grupo in grupos.items():
+            try:
+                self._aplicar(planos, grupo)
+                aplicadas.extend(grupo)
+            except Exception as e:
+                falhas.append((id_treinador, grupo, e))
+
+        ultimo_erro, retidas = None, None
+        for id_treinador, grupo, e in falhas:
+            ultimo_erro = str(e)
+            if not aplicadas and not isinstance(e, BadRequest):
+                retidas = e
+                continue
+            print(f"ERRO: {len(grupo)} mutações do treinador '{id_treinador}' movidas para mutacoes_mortas. Erro: {e}")
+            with self._estado:
+                self._concluir_lote(grupo, erro=ultimo_erro)
+        if retidas is not None and not aplicadas:
+            raise retidas
+        return aplicadas, ultimo_erro
+
+    def reprocessar_mortas(self, id_treinador: str = None) -> int:
+        """Devolve à fila, na ordem original, as mutações em `mutacoes_mortas`. Retorna quantas voltaram."""
+        filtro, params = ("WHERE id_treinador = ?", (id_treinador,)) if id_treinador else ("", ())
+        with self._estado:
+            with self._conectar() as conn:
+                mortas = conn.execute(f"SELECT seq, id_treinador FROM mutacoes_mortas {filtro}", params).fetchall()
+                conn.execute(f"""
+                    INSERT INTO mutacoes (seq, id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em)
+                    SELECT seq, id_treinador, operacao, nome_alvo, id_pokemon, nome_novo, tipo_primario, tipo_secundario, criado_em
+                    FROM mutacoes_mortas {filtro}
+                """, params)
+                conn.execute(f"DELETE FROM mutacoes_mortas {filtro}", params)
+            for id_treinador_morto in {row["id_treinador"] for row in mortas}:
+                self._geracoes[id_treinador_morto] = self._geracoes.get(id_treinador_morto, 0) + 1
+        return len(mortas)
+
+    def _executar_merge(self, mutacoes: list[dict]):
+        linhas = [
+            StructQueryParameter(
+                None,
+                ScalarQueryParameter("operacao", "STRING", m["operacao"]),
+                ScalarQueryParameter("id_treinador", "STRING", m["id_treinador"]),
+                ScalarQueryParameter("id_pokemon", "STRING", m["id_pokemon"]),
+                ScalarQueryParameter("nome_novo", "STRING", m["nome_novo"]),
+                ScalarQueryParameter("t1", "STRING", m["tipo_primario"]),
+                ScalarQueryParameter("t2", "STRING", m["tipo_secundario"]),
+                ScalarQueryParameter("criado_em", "TIMESTAMP", datetime.fromisoformat(m["criado_em"]) if m["criado_em"] else None),
+            )
+            for m in mutacoes
+        ]
+        job_config = QueryJobConfig(query_parameters=[ArrayQueryParameter("mutacoes", "STRUCT", linhas)])
+        # Tudo casa por id e leva o estado final da linha, então reaplicar o plano depois de
+        # um MERGE já gravado (queda antes da limpeza da fila) não duplica nem renomeia nada.
+        get_bq_client().query(f"""
+            MERGE {self.table_equipe} T
+            USING (SELECT * FROM UNNEST(@mutacoes)) S
+            ON T.id_pokemon = S.id_pokemon
+            WHEN MATCHED AND S.operacao = 'DELETE' THEN DELETE
+            WHEN MATCHED AND S.operacao = 'UPDATE' THEN
+                UPDATE SET nome_pokemon = S.nome_novo, tipo_primario = S.t1, tipo_secundario = S.t2
+            WHEN NOT MATCHED BY TARGET AND S.operacao = 'INSERT' THEN
+                INSERT (id_pokemon, id_treinador_fk, nome_pokemon, tipo_primario, tipo_secundario, data_adicao)
+                VALUES (S.id_pokemon, S.id_treinador, S.nome_novo, S.t1, S.t2, S.criado_em)
+        """, job_config=job_config).result()
+
+    def metricas(self) -> dict:
+        """Retorna a profundidade da fila, as falhas e as métricas de latência dos flushes."""
+        pendentes = self.pendentes()
+        with self._conectar() as conn:
+            mortas = conn.execute("SELECT COUNT(*) FROM mutacoes_mortas").fetchone()[0]
+            bloqueados = [row[0] for row in conn.execute("SELECT DISTINCT id_treinador FROM mutacoes_mortas ORDER BY id_treinador")]
+        m = dict(self._metricas)
+        latencia_total_ms = m.pop("latencia_total_ms")
+        m["media_latencia_ms"] = round(latencia_total_ms / m["flushes_ok"], 1) if m["flushes_ok"] else None
+        m["profundidade"] = len(pendentes)
+        m["idade_mais_antiga_ms"] = (
+            round((datetime.now(timezone.utc) - datetime.fromisoformat(pendentes[0]["criado_em"])).total_seconds() * 1000, 1)
+            if pendentes else None
+        )
+        m["falhas_consecutivas"] = self._falhas_consecutivas
+        m["max_tentativas"] = self.max_tentativas
+        m["mutacoes_mortas"] = mortas
+        m["treinadores_bloqueados"] = bloqueados
+        m["mutacoes_retidas"] = sum(1 for op in pendentes if op["id_treinador"] in bloqueados)
+        m["intervalo_flush_s"] = self.intervalo
+        m["proxima_espera_s"] = self._proxima_espera()
+        return m
+
+    def _proxima_espera(self) -> float:
+        """Intervalo até o próximo flush, dobrando a cada falha seguida até `max_tentativas` dobras."""
+        return self.intervalo * 2 ** min(self._falhas_consecutivas, self.max_tentativas)
+
+    def iniciar(self):
+        """Inicia a thread de flush periódico e agenda um último flush na saída do processo."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="flush-equipe", daemon=True)
+        self._thread.start()
+        atexit.register(self.parar)
+
+    def parar(self):
+        self._parar.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"ERRO: Flush final da fila de equipes falhou, mutações continuam em '{self.caminho}'. Erro: {e}")
+
+    def _loop(self):
+        while not self._parar.wait(self._proxima_espera()):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"ERRO: Flush da fila de equipes falhou ({self._falhas_consecutivas}/{self.max_tentativas}), nova tentativa em {self._proxima_espera()}s. Erro: {e}")
@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import requests
+from google.cloud.bigquery import QueryJobConfig, ScalarQueryParameter
+
+from ..db.connection import get_bq_client
+from .tools import TABLE_TREINADORES, TABLE_EQUIPE, ler_equipe_com_pendentes
+
+# Ordem fixa dos 18 tipos: o índice de cada tipo é a linha/coluna na matriz de efetividade.
+TIPOS = [
+    "normal", "fire", "water", "electric", "grass", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy",
+]
+INDICE_TIPO = {tipo: i for i, tipo in enumerate(TIPOS)}
+SEM_TIPO = len(TIPOS)  # Índice usado para o tipo secundário ausente.
+MAX_SUGESTOES = 5
+
+# Apenas os confrontos diferentes de 1x (ataque -> defesa), geração 6 em diante.
+_EFETIVIDADE_NAO_NEUTRA = {
+    "normal": {"rock": 0.5, "ghost": 0, "steel": 0.5},
+    "fire": {"fire": 0.5, "water": 0.5, "grass": 2, "ice": 2, "bug": 2, "rock": 0.5, "dragon": 0.5, "steel": 2},
+    "water": {"fire": 2, "water": 0.5, "grass": 0.5, "ground": 2, "rock": 2, "dragon": 0.5},
+    "electric": {"water": 2, "electric": 0.5, "grass": 0.5, "ground": 0, "flying": 2, "dragon": 0.5},
+    "grass": {"fire": 0.5, "water": 2, "grass": 0.5, "poison": 0.5, "ground": 2, "flying": 0.5, "bug": 0.5, "rock": 2, "dragon": 0.5, "steel": 0.5},
+    "ice": {"fire": 0.5, "water": 0.5, "grass": 2, "ice": 0.5, "ground": 2, "flying": 2, "dragon": 2, "steel": 0.5},
+    "fighting": {"normal": 2, "ice": 2, "poison": 0.5, "flying": 0.5, "psychic": 0.5, "bug": 0.5, "rock": 2, "ghost": 0, "dark": 2, "steel": 2, "fairy": 0.5},
+    "poison": {"grass": 2, "poison": 0.5, "ground": 0.5, "rock": 0.5, "ghost": 0.5, "steel": 0, "fairy": 2},
+    "ground": {"fire": 2, "electric": 2, "grass": 0.5, "poison": 2, "flying": 0, "bug": 0.5, "rock": 2, "steel": 2},
+    "flying": {"electric": 0.5, "grass": 2, "fighting": 2, "bug": 2, "rock": 0.5, "steel": 0.5},
+    "psychic": {"fighting": 2, "poison": 2, "psychic": 0.5, "dark": 0, "steel": 0.5},
+    "bug": {"fire": 0.5, "grass": 2, "fighting": 0.5, "poison": 0.5, "flying": 0.5, "psychic": 2, "ghost": 0.5, "dark": 2, "steel": 0.5, "fairy": 0.5},
+    "rock": {"fire": 2, "ice": 2, "fighting": 0.5, "ground": 0.5, "flying": 2, "bug": 2, "steel": 0.5},
+    "ghost": {"normal": 0, "psychic": 2, "ghost": 2, "dark": 0.5},
+    "dragon": {"dragon": 2, "steel": 0.5, "fairy": 0},
+    "dark": {"fighting": 0.5, "psychic": 2, "ghost": 2, "dark": 0.5, "fairy": 0.5},
+    "steel": {"fire": 0.5, "water": 0.5, "electric": 0.5, "ice": 2, "rock": 2, "steel": 0.5, "fairy": 2},
+    "fairy": {"fire": 0.5, "fighting": 2, "poison": 0.5, "dragon": 2, "dark": 2, "steel": 0.5},
+}
+
+
+def _montar_matriz_efetividade() -> np.ndarray:
+    """
+    Monta a matriz 18x19 de efetividade (linha = tipo do ataque, coluna = tipo do defensor).
+
+    A 19ª coluna vale sempre 1 e representa o tipo secundário ausente, o que permite
+    calcular o multiplicador de qualquer Pokémon como o produto de duas colunas.
+    """
+    matriz = np.ones((len(TIPOS), len(TIPOS) + 1), dtype=np.float32)
+    for ataque, confrontos in _EFETIVIDADE_NAO_NEUTRA.items():
+        for defesa, multiplicador in confrontos.items():
+            matriz[INDICE_TIPO[ataque], INDICE_TIPO[defesa]] = multiplicador
+    return matriz
+
+
+EFETIVIDADE = _montar_matriz_efetividade()
+
+POKEDEX_CACHE_PATH = os.getenv("POKEDEX_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "pokebot_pokedex_tipos.json")
+_pokedex = None
+
+
+def _baixar_pokedex_por_tipo() -> dict:
+    """Monta o mapa nome -> [tipo1, tipo2] com 18 chamadas ao endpoint /type da PokeAPI."""
+    tipos_por_pokemon = {}
+    for tipo in TIPOS:
+        response = requests.get(f"https://pokeapi.co/api/v2/type/{tipo}/")
+        response.raise_for_status()
+        for entrada in response.json().get("pokemon", []):
+            pokemon_id = int(entrada["pokemon"]["url"].rstrip("/").split("/")[-1])
+            if pokemon_id >= 10000:  # Formas alternativas (megas, regionais, etc.)
+                continue
+            slots = tipos_por_pokemon.setdefault(entrada["pokemon"]["name"], [None, None])
+            slots[entrada["slot"] - 1] = tipo
+    return tipos_por_pokemon
+
+
+def get_pokedex():
+    """
+    Retorna os nomes e a matriz (N, 2) de índices de tipo de toda a Pokédex.
+
+    Os dados ficam em memória e em um arquivo JSON local, então a PokeAPI só é
+    consultada na primeira execução.
+    """
+    global _pokedex
+    if _pokedex is not None:
+        return _pokedex
+
+    try:
+        with open(POKEDEX_CACHE_PATH, encoding="utf-8") as f:
+            tipos_por_pokemon = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print("INFO: Baixando tipos da Pokédex completa da PokeAPI...")
+        tipos_por_pokemon = _baixar_pokedex_por_tipo()
+        with open(POKEDEX_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(tipos_por_pokemon, f)
+
+    nomes = np.array(sorted(tipos_por_pokemon))
+    indices = np.array(
+        [[_indice_tipo(t) for t in tipos_por_pokemon[nome]] for nome in nomes],
+        dtype=np.intp,
+    )
+    _pokedex = (nomes, indices)
+    return _pokedex
+
+
+def _indice_tipo(tipo) -> int:
+    return INDICE_TIPO.get(tipo.strip().lower(), SEM_TIPO) if tipo else SEM_TIPO
+
+
+def multiplicadores_defensivos(indices_tipos: np.ndarray) -> np.ndarray:
+    """Para índices (N, 2), retorna (N, 18) com o dano recebido de cada tipo de ataque."""
+    return (EFETIVIDADE[:, indices_tipos[:, 0]] * EFETIVIDADE[:, indices_tipos[:, 1]]).T
+
+
+def multiplicadores_ofensivos(indices_tipos: np.ndarray) -> np.ndarray:
+    """Para índices (N, 2), retorna (N, 18) com o melhor dano de STAB contra cada tipo defensor."""
+    # A linha extra de zeros faz o tipo secundário ausente nunca ser o melhor ataque.
+    ataque = np.vstack([EFETIVIDADE[:, :len(TIPOS)], np.zeros(len(TIPOS), dtype=EFETIVIDADE.dtype)])
+    return np.maximum(ataque[indices_tipos[:, 0]], ataque[indices_tipos[:, 1]])
+
+
+def _tipos_onde(mascara: np.ndarray) -> list[str]:
+    return [TIPOS[i] for i in np.flatnonzero(mascara)]
+
+
+def analisar_equipe(id_treinador_alvo: str) -> dict:
+    """
+    Analisa a cobertura de tipos da equipe de um treinador e sugere Pokémon para completá-la.
+
+    Calcula as fraquezas e resistências de cada membro, as fraquezas gerais da equipe,
+    os tipos que a equipe acerta de forma super efetiva e os melhores Pokémon da Pokédex
+    para adicionar, considerando defesa e cobertura ofensiva.
+
+    Args:
+        id_treinador_alvo (str): O ID do treinador cuja equipe será analisada.
+
+    Returns:
+        dict: Um dicionário com a análise por membro, o resumo da equipe e as sugestões, ou um erro.
+    """
+    if not id_treinador_alvo or not isinstance(id_treinador_alvo, str):
+        return {"error": "O ID do treinador é inválido."}
+
+    client = get_bq_client()
+    job_config = QueryJobConfig(query_parameters=[ScalarQueryParameter("id", "STRING", id_treinador_alvo)])
+
+    def ler_do_banco():
+        query_job = client.query(f"""
+            SELECT t.nome_treinador, e.nome_pokemon, e.tipo_primario, e.tipo_secundario
+            FROM {TABLE_TREINADORES} t
+            LEFT JOIN {TABLE_EQUIPE} e ON e.id_treinador_fk = t.id_treinador
+            WHERE t.id_treinador = @id
+            ORDER BY e.data_adicao
+        """, job_config=job_config)
+        resultados = list(query_job.result())
+        # O nome vem das linhas do BigQuery, antes da sobreposição, que pode apagar todas elas.
+        nome_treinador = resultados[0].nome_treinador if resultados else None
+        equipe = [
+            {"nome_pokemon": row.nome_pokemon, "tipo_primario": row.tipo_primario, "tipo_secundario": row.tipo_secundario}
+            for row in resultados if row.nome_pokemon
+        ]
+        return nome_treinador, equipe
+
+    try:
+        nome_treinador_atual, equipe = ler_equipe_com_pendentes(id_treinador_alvo, ler_do_banco)
+    except Exception as e:
+        return {"error": f"Erro ao buscar equipe do treinador: {e}"}
+
+    if nome_treinador_atual is None:
+        return {"error": f"Treinador com ID '{id_treinador_alvo}' não encontrado."}
+    if not equipe:
+        return {"error": f"O treinador '{nome_treinador_atual}' não possui Pokémon em sua equipe."}
+
+    nomes_equipe = [row["nome_pokemon"].lower() for row in equipe]
+    indices_equipe = np.array(
+        [[_indice_tipo(row["tipo_primario"]), _indice_tipo(row["tipo_secundario"])] for row in equipe],
+        dtype=np.intp,
+    )
+
+    defesa_equipe = multiplicadores_defensivos(indices_equipe)
+    fracos = (defesa_equipe > 1).sum(axis=0)
+    resistentes = (defesa_equipe < 1).sum(axis=0)
+    exposicao = fracos - resistentes
+    cobertura_equipe = (multiplicadores_ofensivos(indices_equipe) > 1).any(axis=0)
+
+    membros = [
+        {
+            "nome": nome,
+            "fraquezas": {TIPOS[i]: float(m) for i, m in enumerate(defesa) if m > 1},
+            "resistencias": {TIPOS[i]: float(m) for i, m in enumerate(defesa) if m < 1},
+        }
+        for nome, defesa in zip(nomes_equipe, defesa_equipe)
+    ]
+
+    analise = {
+        "treinador": nome_treinador_atual,
+        "membros": membros,
+        "fraquezas_da_equipe": _tipos_onde(exposicao > 0),
+        "cobertura_super_efetiva": _tipos_onde(cobertura_equipe),
+        "sem_cobertura_super_efetiva": _tipos_onde(~cobertura_equipe),
+    }
+
+    if len(equipe) >= 6:
+        analise["sugestoes"] = []
+        return analise
+
+    try:
+        nomes_pokedex, indices_pokedex = get_pokedex()
+    except Exception as e:
+        analise["sugestoes_error"] = f"Não foi possível carregar a Pokédex para sugestões: {e}"
+        return analise
+
+    # Pontuação de todos os candidatos de uma vez: resistir a um tipo que já ameaça a equipe
+    # vale mais, ganhar uma fraqueza nova custa o mesmo peso, e cada tipo defensor passa a
+    # ser acertado de forma super efetiva soma um ponto.
+    peso = 1 + np.maximum(exposicao, 0)
+    defesa_candidatos = multiplicadores_defensivos(indices_pokedex)
+    pontos_defesa = ((defesa_candidatos < 1).astype(np.int32) - (defesa_candidatos > 1)) @ peso
+    novos_tipos_cobertos = (multiplicadores_ofensivos(indices_pokedex) > 1) & ~cobertura_equipe
+    pontuacao = (pontos_defesa + novos_tipos_cobertos.sum(axis=1)).astype(np.float64)
+    pontuacao[np.isin(nomes_pokedex, nomes_equipe)] = -np.inf
+
+    quantidade = min(MAX_SUGESTOES, int(np.isfinite(pontuacao).sum()))
+    if quantidade == 0:
+        analise["sugestoes"] = []
+        return analise
+    melhores = np.argpartition(-pontuacao, quantidade - 1)[:quantidade]
+    melhores = melhores[np.argsort(-pontuacao[melhores], kind="stable")]
+    analise["sugestoes"] = [
+        {
+            "nome": str(nomes_pokedex[i]),
+            "tipos": [TIPOS[t] for t in indices_pokedex[i] if t != SEM_TIPO],
+            "pontuacao": int(pontuacao[i]),
+            "novos_tipos_cobertos": _tipos_onde(novos_tipos_cobertos[i]),
+        }
+        for i in melhores
+    ]
+    return analise
@@ -9,6 +9,7 @@ import os
 from google.cloud.bigquery import QueryJobConfig, ScalarQueryParameter
 
 from ..db.connection import get_bq_client, ADMIN_PASSWORD
+from ..db.fila_escrita import get_fila_escrita
 
 # Carrega as variáveis de ambiente
 PROJECT_ID = os.getenv("APP_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -177,6 +178,24 @@ def validar_proxima_evolucao(arvore_evolucao: dict, pokemon_atual: str, evolucao
             fila.extend(estagio_atual["evolves_to"])
     return False
 
+def ler_equipe_com_pendentes(id_treinador: str, ler_do_banco) -> tuple:
+    """
+    Executa a leitura da equipe e, no modo write-behind, aplica as mutações ainda não gravadas.
+
+    `ler_do_banco` retorna `(contexto, equipe)`; só a equipe recebe as mutações pendentes,
+    o contexto (ex: o nome do treinador) volta como foi lido do BigQuery.
+    """
+    fila = get_fila_escrita(TABLE_EQUIPE)
+    if fila is None:
+        return ler_do_banco()
+    return fila.ler_equipe(id_treinador, ler_do_banco)
+
+def _ler_equipe(client, job_config, id_treinador: str) -> list[dict]:
+    def ler_do_banco():
+        equipe_job = client.query(f"SELECT nome_pokemon, tipo_primario, tipo_secundario FROM {TABLE_EQUIPE} WHERE id_treinador_fk = @id ORDER BY data_adicao", job_config=job_config)
+        return None, [dict(row.items()) for row in equipe_job.result()]
+    return ler_equipe_com_pendentes(id_treinador, ler_do_banco)[1]
+
 def verifica_senha(codigo_fornecido: str) -> bool:
     """Verifica se o código de confirmação fornecido está correto."""
     return codigo_fornecido == ADMIN_PASSWORD
@@ -316,6 +335,7 @@ def adicionar_pokemons(id_treinador_alvo: str, nomes_novos_pokemons: list[str])
         return f"Erro: Nenhum dos Pokémon fornecidos é válido. Inválidos: {', '.join(pokemons_invalidos)}."
 
     client = get_bq_client()
+    fila = get_fila_escrita(TABLE_EQUIPE)
     try:
         job_config = QueryJobConfig(query_parameters=[ScalarQueryParameter("id", "STRING", id_treinador_alvo)])
         
@@ -325,13 +345,24 @@ def adicionar_pokemons(id_treinador_alvo: str, nomes_novos_pokemons: list[str])
             return f"Erro: Treinador com ID '{id_treinador_alvo}' não encontrado."
         nome_treinador_atual = res_treinador[0].nome_treinador
 
-        count_job = client.query(f"SELECT COUNT(*) as total FROM {TABLE_EQUIPE} WHERE id_treinador_fk = @id", job_config=job_config)
-        count_atual = list(count_job.result())[0].total
+        if fila is not None:
+            count_atual = len(_ler_equipe(client, job_config, id_treinador_alvo))
+        else:
+            count_job = client.query(f"SELECT COUNT(*) as total FROM {TABLE_EQUIPE} WHERE id_treinador_fk = @id", job_config=job_config)
+            count_atual = list(count_job.result())[0].total
         if count_atual + len(equipe_para_inserir) > 6:
             return f"Erro: Adicionar {len(equipe_para_inserir)} Pokémon à equipe de '{nome_treinador_atual}' (que já tem {count_atual}) excederia o limite de 6."
 
         for p_data in equipe_para_inserir:
             tipos_val = p_data.get("types", [])
+            if fila is not None:
+                fila.enfileirar(
+                    id_treinador_alvo, "INSERT",
+                    nome_novo=p_data["pokemon_name"],
+                    tipo_primario=tipos_val[0] if tipos_val else None,
+                    tipo_secundario=tipos_val[1] if len(tipos_val) > 1 else None,
+                )
+                continue
             insert_config = QueryJobConfig(query_parameters=[
                 ScalarQueryParameter("id_treinador", "STRING", id_treinador_alvo),
                 ScalarQueryParameter("nome_p", "STRING", p_data["pokemon_name"]),
@@ -392,18 +423,17 @@ def listar_pokemons(id_treinador_alvo: str) -> str:
             return f"Erro: Treinador com ID '{id_treinador_alvo}' não encontrado."
         nome_treinador_atual = res_treinador[0].nome_treinador
         
-        equipe_job = client.query(f"SELECT nome_pokemon, tipo_primario, tipo_secundario FROM {TABLE_EQUIPE} WHERE id_treinador_fk = @id ORDER BY data_adicao", job_config=job_config)
-        resultados_equipe = list(equipe_job.result())
+        resultados_equipe = _ler_equipe(client, job_config, id_treinador_alvo)
 
         if not resultados_equipe:
             return f"O treinador '{nome_treinador_atual}' não possui Pokémon em sua equipe."
         
         lista_formatada = [f"Equipe de {nome_treinador_atual} (ID: {id_treinador_alvo}):"]
         for i, row in enumerate(resultados_equipe):
-            tipos_str = row.tipo_primario
-            if row.tipo_secundario:
-                tipos_str += f" / {row.tipo_secundario}"
-            lista_formatada.append(f"  {i+1}. {row.nome_pokemon.capitalize()} (Tipos: {tipos_str})")
+            tipos_str = row["tipo_primario"]
+            if row["tipo_secundario"]:
+                tipos_str += f" / {row['tipo_secundario']}"
+            lista_formatada.append(f"  {i+1}. {row['nome_pokemon'].capitalize()} (Tipos: {tipos_str})")
         return "\n".join(lista_formatada)
     except Exception as e:
         return f"Erro ao listar Pokémon: {e}"
@@ -426,7 +456,16 @@ def apagar_pokemon(id_treinador_alvo: str, nome_pokemon_remover: str) -> str:
         return "Erro: O nome do Pokémon a remover não pode ser vazio."
 
     client = get_bq_client()
+    fila = get_fila_escrita(TABLE_EQUIPE)
     try:
+        if fila is not None:
+            job_config = QueryJobConfig(query_parameters=[ScalarQueryParameter("id", "STRING", id_treinador_alvo)])
+            equipe = _ler_equipe(client, job_config, id_treinador_alvo)
+            if not any(p["nome_pokemon"].lower() == nome_pokemon_remover.lower() for p in equipe):
+                return f"Informação: Pokémon '{nome_pokemon_remover}' não foi encontrado na equipe do treinador especificado."
+            fila.enfileirar(id_treinador_alvo, "DELETE", nome_alvo=nome_pokemon_remover)
+            return f"Sucesso: Pokémon '{nome_pokemon_remover}' removido da equipe."
+
         job_config = QueryJobConfig(query_parameters=[
             ScalarQueryParameter("id_treinador", "STRING", id_treinador_alvo),
             ScalarQueryParameter("nome_p", "STRING", nome_pokemon_remover.lower()),
@@ -465,6 +504,11 @@ def apagar_treinador(id_treinador_alvo: str, codigo_de_confirmacao: str) -> str:
         # CORREÇÃO: Executamos os deletes sequencialmente com parâmetros.
         job_config = QueryJobConfig(query_parameters=[ScalarQueryParameter("id", "STRING", id_treinador_alvo)])
 
+        # 0. Descartar mutações ainda pendentes na fila write-behind, para não recriar a equipe depois
+        fila = get_fila_escrita(TABLE_EQUIPE)
+        if fila is not None:
+            fila.descartar(id_treinador_alvo)
+
         # 1. Apagar os Pokémon da equipe (tabela filha)
         client.query(f"DELETE FROM {TABLE_EQUIPE} WHERE id_treinador_fk = @id", job_config=job_config).result()
 
@@ -513,7 +557,22 @@ def evoluir_pokemon(id_treinador: str, nome_pokemon_atual: str, nome_pokemon_evo
     novo_tipo2 = tipos_val[1] if len(tipos_val) > 1 else None
     
     client = get_bq_client()
+    fila = get_fila_escrita(TABLE_EQUIPE)
     try:
+        if fila is not None:
+            job_config = QueryJobConfig(query_parameters=[ScalarQueryParameter("id", "STRING", id_treinador)])
+            equipe = _ler_equipe(client, job_config, id_treinador)
+            if not any(p["nome_pokemon"].lower() == nome_atual_lower for p in equipe):
+                return f"Erro: O treinador não possui um Pokémon chamado '{nome_pokemon_atual}' em sua equipe para evoluir."
+            fila.enfileirar(
+                id_treinador, "UPDATE",
+                nome_alvo=nome_atual_lower,
+                nome_novo=nome_evolucao_lower.capitalize(),
+                tipo_primario=novo_tipo1,
+                tipo_secundario=novo_tipo2,
+            )
+            return f"Sucesso! O Pokémon '{nome_pokemon_atual.capitalize()}' evoluiu para '{nome_pokemon_evolucao.capitalize()}'!"
+
         job_config = QueryJobConfig(query_parameters=[
             ScalarQueryParameter("novo_nome", "STRING", nome_evolucao_lower.capitalize()),
             ScalarQueryParameter("t1", "STRING", novo_tipo1),
@@ -533,4 +592,41 @@ def evoluir_pokemon(id_treinador: str, nome_pokemon_atual: str, nome_pokemon_evo
         else:
             return f"Erro: O treinador não possui um Pokémon chamado '{nome_pokemon_atual}' em sua equipe para evoluir."
     except Exception as e:
-        return f"Erro ao tentar evoluir Pokémon no banco de dados: {e}"
\ No newline at end of file
+        return f"Erro ao tentar evoluir Pokémon no banco de dados: {e}"
+
+
+def metricas_fila_escrita() -> dict:
+    """
+    Retorna as métricas da fila write-behind das equipes (profundidade e latência dos flushes).
+
+    Returns:
+        dict: As métricas da fila ou um aviso de que o modo write-behind está desativado.
+    """
+    fila = get_fila_escrita(TABLE_EQUIPE)
+    if fila is None:
+        return {"status": "desativado", "message": "O modo write-behind não está ativo (EQUIPE_WRITE_BEHIND)."}
+    return {"status": "ativo", **fila.metricas()}
+
+
+def reprocessar_fila_escrita(codigo_de_confirmacao: str) -> str:
+    """
+    Devolve à fila write-behind as mutações de equipe que foram separadas por erro (mutacoes_mortas).
+
+    Esta é uma operação administrativa e requer um código de confirmação para ser executada.
+
+    Args:
+        codigo_de_confirmacao (str): O código de segurança necessário para autorizar o reprocessamento.
+
+    Returns:
+        str: Uma mensagem de sucesso ou erro.
+    """
+    if not verifica_senha(codigo_de_confirmacao):
+        return "Erro: Código de confirmação incorreto. A operação foi cancelada."
+    fila = get_fila_escrita(TABLE_EQUIPE)
+    if fila is None:
+        return "Informação: O modo write-behind não está ativo (EQUIPE_WRITE_BEHIND)."
+    try:
+        total = fila.reprocessar_mortas()
+    except Exception as e:
+        return f"Erro ao reprocessar a fila de equipes: {e}"
+    return f"Sucesso: {total} mutações devolvidas à fila para nova tentativa."
\ No newline at end of file